@@ -1,18 +1,31 @@
 from google import genai
 from whisper.prompt import prompt
 from dotenv import load_dotenv
+import asyncio
 import os
+import sys
 
 load_dotenv()
 
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 
-myfile = client.files.upload(
-    file="/home/anujkumar/work/Speech-To-Text-Models/whisper/da5b-cd90-478d-8cd5-3b2e700d4aaf.mp3"
-)
 
-response = client.models.generate_content(
-    model="gemini-2.5-flash", contents=[prompt, myfile]
-)
+async def transcribe(path):
+    myfile = await client.aio.files.upload(file=path)
+
+    # Stream the response so the transcript starts printing with the first
+    # generated tokens instead of after the whole response.
+    async for chunk in await client.aio.models.generate_content_stream(
+        model="gemini-2.5-flash", contents=[prompt, myfile]
+    ):
+        if chunk.text:
+            sys.stdout.write(chunk.text)
+            sys.stdout.flush()
+    print()
 
-print(response.text)
+
+asyncio.run(
+    transcribe(
+        "/home/anujkumar/work/Speech-To-Text-Models/whisper/da5b-cd90-478d-8cd5-3b2e700d4aaf.mp3"
+    )
+)
@@ -1,15 +1,36 @@
+import argparse
+import asyncio
+import atexit
+import collections
 import gradio as gr
 import pyaudio
 from google.cloud import speech
+import os
+import queue
+import shutil
+import tempfile
 import threading
 import time
 
 # --- Configuration ---
 RATE = 16000
-CHUNK = int(RATE / 10)  # 100ms
+FRAME_MS = 20  # Capture granularity; the first request goes out after one frame
+CHUNK = int(RATE * FRAME_MS / 1000)  # 20ms
+CHUNK_MS = 100  # Steady-state request size, see --chunk_ms
+# How much captured audio to hold while the network thread catches up
+# (16 frames); beyond that the oldest audio is dropped.
+BUFFER_MS = 320
+# How often the UI stream checks for a new transcript version (seconds).
+STREAM_POLL_INTERVAL = 0.03
+# Longest the UI stream goes without yielding, so Gradio notices a closed tab
+# and cancels its generator even while the transcript is idle (seconds).
+STREAM_KEEPALIVE = 1.0
+# Final text kept in memory and shown live; older text is spilled to a log
+# file on disk and included when the full transcript is downloaded.
+MAX_DISPLAY_CHARS = 10_000
 
 # Extended language list for better switching
-LANGUAGE_CODES = [
+SUPPORTED_LANGUAGE_CODES = [
     "en-US",  # English (US)
     "hi-IN",  # Hindi (India)
     "es-ES",  # Spanish (Spain)
@@ -20,13 +41,45 @@ LANGUAGE_CODES = [
     "ar-SA",  # Arabic
 ]
 
+# Languages sent to Google, primary first (see --languages). Google decodes
+# every alternative language, so each extra one adds server-side latency;
+# detecting all 8 is a latency multiplier. Keep this to the 2-3 you speak.
+LANGUAGE_CODES = ["en-US", "hi-IN", "gu-IN"]
+
+# "latest_short" returns first results much sooner than "default" for
+# utterances up to ~15s; use "latest_long" or "default" for long dictation.
+RECOGNITION_MODEL = "latest_short"
+
+# Short tags used to mark language switches in the transcript
+LANGUAGE_TAGS = {
+    "en-US": "EN",
+    "hi-IN": "HI",
+    "es-ES": "ES",
+    "gu-IN": "GU",
+    "de-DE": "DE",
+    "ja-JP": "JA",
+    "zh-CN": "ZH",
+    "ar-SA": "AR",
+}
+
 
 class MicrophoneStream:
-    """Opens a recording stream as a generator yielding the audio chunks."""
+    """Opens a recording stream as a generator yielding the audio chunks.
+
+    PyAudio runs in callback mode: PortAudio drains the sound card on its own
+    thread and hands each chunk to ``_fill_buffer``, so a slow network send
+    never blocks capture. The generator only dequeues ready chunks.
+    """
 
-    def __init__(self, rate, chunk):
+    def __init__(self, rate, chunk, max_chunk_ms=CHUNK_MS):
         self._rate = rate
         self._chunk = chunk
+        self._frame_ms = max(1, chunk * 1000 // rate)
+        self._max_chunk_ms = max(self._frame_ms, max_chunk_ms)
+        self._request_ms = self._frame_ms
+        # Bounded so a stalled network thread can't grow the backlog without
+        # limit; _put drops the oldest frames when it is full.
+        self._buff = queue.Queue(maxsize=max(1, BUFFER_MS // self._frame_ms))
         self._audio_interface = pyaudio.PyAudio()
         self._audio_stream = self._audio_interface.open(
             format=pyaudio.paInt16,
@@ -34,6 +87,7 @@ class MicrophoneStream:
             rate=self._rate,
             input=True,
             frames_per_buffer=self._chunk,
+            stream_callback=self._fill_buffer,
         )
         self.closed = False
 
@@ -44,14 +98,59 @@ class MicrophoneStream:
         self._audio_stream.stop_stream()
         self._audio_stream.close()
         self.closed = True
+        # Wake the generator so it can observe ``closed`` and return.
+        self._put(None)
         self._audio_interface.terminate()
 
+    def _put(self, item):
+        """Queue an item, dropping the oldest one if the buffer is full.
+
+        Dropping the oldest rather than the newest audio keeps what Google
+        receives aligned with real time, which the endpointer relies on.
+        """
+        try:
+            self._buff.put_nowait(item)
+        except queue.Full:
+            try:
+                self._buff.get_nowait()
+            except queue.Empty:
+                pass
+            self._buff.put_nowait(item)
+
+    def _fill_buffer(self, in_data, frame_count, time_info, status_flags):
+        """Collect data from the audio stream into the buffer."""
+        self._put(in_data)
+        return None, pyaudio.paContinue
+
+    def _get(self):
+        """Wait for the next frame; None once the stream is closed."""
+        while not self.closed:
+            try:
+                return self._buff.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+
+    def reset_framing(self):
+        """Go back to one-frame requests, e.g. after an utterance ends."""
+        self._request_ms = self._frame_ms
+
     def _generator(self):
+        # Progressive framing: send the first frame as soon as it is captured,
+        # then double the request size up to the steady-state chunk. The first
+        # partial hypothesis no longer waits for a full 100ms chunk.
+        self.reset_framing()
         while not self.closed:
-            data = self._audio_stream.read(self._chunk, exception_on_overflow=False)
-            if not data:
-                break
-            yield data
+            data = []
+            while len(data) * self._frame_ms < self._request_ms:
+                chunk = self._get()
+                if not chunk:
+                    if data:
+                        yield b"".join(data)
+                    return
+                data.append(chunk)
+            yield b"".join(data)
+            self._request_ms = min(self._request_ms * 2, self._max_chunk_ms)
 
 
 class TranscriptionManager:
@@ -61,13 +160,105 @@ class TranscriptionManager:
         self.is_recording = False
         self.stream = None
         self.client = None
-        self.full_transcript = ""
+        # Final segments are appended as fragments and joined lazily, so a
+        # long session doesn't re-copy the whole transcript on every segment.
+        self._fragments = collections.deque()
+        self._fragment_count = 0
+        self._fragment_chars = 0
+        self._joined = (0, "")  # (fragment count, joined text)
+        # Append-only log of text trimmed from the in-memory window.
+        self._log_file = None
+        self._log_lock = threading.Lock()
+        # One export file per manager, rewritten on every download.
+        self._export_path = None
+        atexit.register(self._remove_files)
         self.interim_transcript = ""
         self.detected_language = ""
-        self.last_update_time = 0
-        self.last_speech_time = 0
-        self.language_history = []  # Track language changes
+        # Languages seen so far, in order; a dict doubles as an ordered set
+        self.language_history = {}
+        # Guards language_history only; transcript state is published below.
         self.lock = threading.Lock()
+        # Written only by the transcription thread and read by the UI without
+        # locking: rebinding a tuple attribute is atomic under the GIL.
+        self._snapshot = ("", "")  # (interim, detected_language)
+        self.version = 0  # Bumped on every publish so readers can skip no-ops
+        self._cached = (-1, ("", ""))  # (version, get_current_transcript())
+
+    def _publish(self):
+        """Publish the current transcript state for lock-free readers."""
+        self._snapshot = (self.interim_transcript, self.detected_language)
+        self.version += 1
+
+    def _append_final(self, fragment):
+        """Append a final segment to the transcript."""
+        self._fragments.append(fragment)
+        self._fragment_chars += len(fragment)
+        if self._fragment_chars > MAX_DISPLAY_CHARS:
+            self._spill_head()
+        self._fragment_count += 1
+
+    def _spill_head(self):
+        """Move the oldest segments to the on-disk log until the window fits."""
+        with self._log_lock:
+            if self._log_file is None:
+                self._log_file = tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", prefix="transcript_", suffix=".txt", delete=False
+                )
+            while self._fragment_chars > MAX_DISPLAY_CHARS and len(self._fragments) > 1:
+                head = self._fragments.popleft()
+                self._fragment_chars -= len(head)
+                self._log_file.write(head)
+            self._log_file.flush()
+
+    def export_transcript(self):
+        """Write the full transcript, including spilled text, to a file."""
+        with self._log_lock:
+            if self._export_path is None:
+                fd, self._export_path = tempfile.mkstemp(prefix="transcript_full_", suffix=".txt")
+                os.close(fd)
+            with open(self._export_path, "w", encoding="utf-8") as out:
+                if self._log_file is not None:
+                    with open(self._log_file.name, encoding="utf-8") as log:
+                        shutil.copyfileobj(log, out)
+                out.write("".join(self._fragments))
+            return self._export_path
+
+    def _remove_log(self):
+        """Close and delete the spill log; call with _log_lock held."""
+        if self._log_file is not None:
+            self._log_file.close()
+            os.remove(self._log_file.name)
+            self._log_file = None
+
+    def _remove_files(self):
+        """Delete the spill log and the export file (run at process exit)."""
+        with self._log_lock:
+            self._remove_log()
+            if self._export_path is not None:
+                try:
+                    os.remove(self._export_path)
+                except OSError:
+                    pass
+                self._export_path = None
+
+    @property
+    def full_transcript(self):
+        """The final transcript, joined at most once per appended segment."""
+        count = self._fragment_count
+        joined_count, joined = self._joined
+        if joined_count != count:
+            joined = "".join(self._fragments)
+            self._joined = (count, joined)
+        return joined
+
+    def reset_transcript(self):
+        """Drop all transcript state."""
+        with self._log_lock:
+            self._fragments.clear()
+            self._fragment_chars = 0
+            self._remove_log()
+        self._fragment_count += 1
+        self.interim_transcript = ""
 
     def start_transcription(self):
         """Start the transcription process."""
@@ -75,11 +266,10 @@ class TranscriptionManager:
             return "Already recording!", self.full_transcript, self.detected_language
 
         self.is_recording = True
-        self.full_transcript = ""
-        self.interim_transcript = ""
+        self.reset_transcript()
         self.detected_language = "Detecting..."
-        self.language_history = []
-        self.last_speech_time = time.time()
+        self.language_history = {}
+        self._publish()
 
         # Start transcription in a separate thread
         thread = threading.Thread(target=self._transcribe)
@@ -94,10 +284,10 @@ class TranscriptionManager:
         if self.stream:
             self.stream.closed = True
 
+        final_text = self.full_transcript
+        _, lang = self._snapshot
         with self.lock:
-            final_text = self.full_transcript
-            lang = self.detected_language
-            lang_switches = len(set(self.language_history))
+            lang_switches = len(self.language_history)
 
         status = f"⏹️ Stopped. Languages detected: {lang_switches}"
         return status, final_text, lang
@@ -111,11 +301,11 @@ class TranscriptionManager:
             config = speech.RecognitionConfig(
                 encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
                 sample_rate_hertz=RATE,
-                language_code="en-US",  # Primary language
+                language_code=LANGUAGE_CODES[0],  # Primary language
                 # CRITICAL: All alternative languages for mid-speech switching
                 alternative_language_codes=LANGUAGE_CODES[1:],
                 enable_automatic_punctuation=True,
-                model="default",  # Fast response
+                model=RECOGNITION_MODEL,  # Fast response
                 use_enhanced=False,  # Lower latency
                 # ADDED: Enable language detection per segment
                 enable_spoken_punctuation=False,
@@ -128,7 +318,7 @@ class TranscriptionManager:
                 single_utterance=False,
             )
 
-            with MicrophoneStream(RATE, CHUNK) as self.stream:
+            with MicrophoneStream(RATE, CHUNK, CHUNK_MS) as self.stream:
                 audio_generator = self.stream._generator()
                 requests = (
                     speech.StreamingRecognizeRequest(audio_content=content)
@@ -139,8 +329,9 @@ class TranscriptionManager:
                 self._process_responses(responses)
 
         except Exception as e:
-            with self.lock:
-                self.full_transcript = f"Error: {str(e)}"
+            self.reset_transcript()
+            self._append_final(f"Error: {str(e)}")
+            self._publish()
             self.is_recording = False
 
     def _process_responses(self, responses):
@@ -161,75 +352,55 @@ class TranscriptionManager:
             alternative = result.alternatives[0]
             transcript = alternative.transcript
 
-            # Track when we receive speech
-            self.last_speech_time = time.time()
-
             # IMPROVED: Language detection and tracking
-            current_lang = None
-            if hasattr(alternative, "language_code") and alternative.language_code:
-                current_lang = alternative.language_code
-            else:
-                # Fallback to primary language
-                current_lang = LANGUAGE_CODES[0]
+            # language_code is a proto string field: always present, "" if unset.
+            # Fallback to primary language
+            current_lang = alternative.language_code or LANGUAGE_CODES[0]
 
             # Detect language changes
             if current_lang != last_detected_lang and current_lang:
                 last_detected_lang = current_lang
-                with self.lock:
-                    self.detected_language = current_lang
-                    if current_lang not in self.language_history:
-                        self.language_history.append(current_lang)
-
-            with self.lock:
-                if result.is_final:
-                    # ADDED: Mark language switches in transcript
-                    if len(self.language_history) > 1 and current_lang:
-                        lang_tag = self._get_language_name(current_lang)
-                        # Add subtle language marker
-                        self.full_transcript += f"[{lang_tag}] {transcript} "
-                    else:
-                        self.full_transcript += transcript + " "
-                    self.interim_transcript = ""
+                self.detected_language = current_lang
+                if current_lang not in self.language_history:
+                    with self.lock:
+                        self.language_history[current_lang] = None
+
+            if result.is_final:
+                # ADDED: Mark language switches in transcript
+                if len(self.language_history) > 1 and current_lang:
+                    lang_tag = LANGUAGE_TAGS.get(current_lang, current_lang[:2].upper())
+                    # Add subtle language marker
+                    self._append_final(f"[{lang_tag}] {transcript} ")
                 else:
-                    # Show interim with current language
-                    self.interim_transcript = transcript
-
-                self.last_update_time = time.time()
-
-    def _get_language_name(self, lang_code):
-        """Get friendly language name from code."""
-        lang_map = {
-            "en-US": "EN",
-            "hi-IN": "HI",
-            "es-ES": "ES",
-            "gu-IN": "GU",
-            "de-DE": "DE",
-            "ja-JP": "JA",
-            "zh-CN": "ZH",
-            "ar-SA": "AR",
-        }
-        return lang_map.get(lang_code, lang_code[:2].upper())
+                    self._append_final(transcript + " ")
+                self.interim_transcript = ""
+                if self.stream:
+                    self.stream.reset_framing()
+            else:
+                # Show interim with current language
+                self.interim_transcript = transcript
+
+            self._publish()
 
     def get_current_transcript(self):
         """Get the current transcript with interim results."""
-        with self.lock:
-            if self.interim_transcript:
-                # Show current language being detected
-                lang_display = (
-                    self.detected_language
-                    if self.detected_language != "Detecting..."
-                    else "en-US"
-                )
-                return (
-                    self.full_transcript + self.interim_transcript,
-                    f"{lang_display} (Live)",
-                )
-            lang_display = (
-                self.detected_language
-                if self.detected_language != "Detecting..."
-                else "en-US"
-            )
-            return self.full_transcript, lang_display
+        # Read the version first: if a publish races with us, the result is
+        # cached under the older version and recomputed on the next call.
+        version = self.version
+        cached_version, cached = self._cached
+        if cached_version == version:
+            return cached
+
+        interim, detected = self._snapshot
+        full = self.full_transcript
+        lang_display = detected if detected != "Detecting..." else LANGUAGE_CODES[0]
+        if interim:
+            # Show current language being detected
+            current = (full + interim, f"{lang_display} (Live)")
+        else:
+            current = (full, lang_display)
+        self._cached = (version, current)
+        return current
 
 
 # Global transcription manager
@@ -260,23 +431,35 @@ def stop_recording():
     )
 
 
-def update_transcript():
-    """Update the transcript display with minimal latency."""
-    if not manager.is_recording:
-        transcript, language = manager.get_current_transcript()
-        return transcript, language
+async def stream_transcript():
+    """Push the transcript to the UI only when a new version is published."""
+    last_version = -1
+    last_yield = time.monotonic()
+    while True:
+        version = manager.version
+        now = time.monotonic()
+        if version != last_version:
+            last_version = version
+            last_yield = now
+            yield manager.get_current_transcript()
+        elif now - last_yield >= STREAM_KEEPALIVE:
+            # No-op update: gives Gradio a chance to cancel a disconnected client.
+            last_yield = now
+            yield gr.update(), gr.update()
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+
 
-    # Get latest transcript
-    transcript, language = manager.get_current_transcript()
-    return transcript, language
+def download_transcript():
+    """Export the full transcript, including text trimmed from the live view."""
+    return manager.export_transcript()
 
 
 def clear_transcript():
     """Clear the transcript."""
-    manager.full_transcript = ""
-    manager.interim_transcript = ""
+    manager.reset_transcript()
     manager.detected_language = ""
-    manager.language_history = []
+    manager.language_history = {}
+    manager._publish()
     return "", "", "Transcript cleared."
 
 
@@ -304,6 +487,10 @@ with gr.Blocks(title="Multilingual Speech-to-Text", theme=gr.themes.Soft()) as d
                 )
                 clear_btn = gr.Button("🗑️ Clear", size="lg")
 
+            with gr.Row():
+                download_btn = gr.Button("💾 Download Full Transcript", size="sm")
+                download_file = gr.File(label="Full transcript", interactive=False)
+
         with gr.Column(scale=1):
             language_box = gr.Textbox(
                 label="🌐 Current Language", value="", interactive=False, lines=1
@@ -314,7 +501,7 @@ with gr.Blocks(title="Multilingual Speech-to-Text", theme=gr.themes.Soft()) as d
                 ### 🌍 Language Switching
                 - Switch languages anytime
                 - Automatic detection
-                - 8 languages supported
+                - 8 languages supported (choose with `--languages`)
                 - Real-time adaptation
                 """
             )
@@ -326,6 +513,7 @@ with gr.Blocks(title="Multilingual Speech-to-Text", theme=gr.themes.Soft()) as d
         lines=15,
         placeholder="Speak in any language... switch freely!",
         show_copy_button=True,
+        info=f"Shows the latest {MAX_DISPLAY_CHARS:,} characters; download for the full text.",
     )
 
     gr.Markdown(
@@ -337,13 +525,14 @@ with gr.Blocks(title="Multilingual Speech-to-Text", theme=gr.themes.Soft()) as d
 
         1. **Start speaking** in any language (e.g., English)
         2. **Pause briefly** (0.5-1 second)
-        3. **Switch to another language** (e.g., Hindi, Spanish)
+        3. **Switch to another language** (e.g., Hindi, Gujarati)
         4. The system detects the change and adapts!
 
-        **Language markers** like `[HI]`, `[ES]` appear in the transcript when you switch.
+        **Language markers** like `[HI]`, `[GU]` appear in the transcript when you switch.
 
-        ### 📋 Supported Languages:
-        🇺🇸 English | 🇮🇳 Hindi | 🇪🇸 Spanish | 🇫🇷 French | 🇩🇪 German | 🇯🇵 Japanese | 🇨🇳 Chinese | 🇸🇦 Arabic
+        ### 📋 Languages:
+        🇺🇸 English | 🇮🇳 Hindi | 🇮🇳 Gujarati by default. Spanish, German, Japanese,
+        Chinese and Arabic can be enabled with `--languages` (keep it to the 2-3 you speak).
 
         ### 💡 Tips for Best Results:
         - **Pause briefly** between language switches (helps detection)
@@ -382,19 +571,58 @@ with gr.Blocks(title="Multilingual Speech-to-Text", theme=gr.themes.Soft()) as d
         outputs=[transcript_box, language_box, status_box],
     )
 
-    # Fast auto-update
-    timer = gr.Timer(0.1)
-    timer.tick(fn=update_transcript, inputs=[], outputs=[transcript_box, language_box])
+    download_btn.click(fn=download_transcript, inputs=[], outputs=download_file)
+
+    # Stream transcript changes instead of polling on a timer. Every open tab
+    # holds its own never-ending stream, so don't cap concurrent runs at 1;
+    # the generator is async, so idle tabs wait on the event loop rather
+    # than each pinning a worker thread.
+    demo.load(
+        fn=stream_transcript,
+        inputs=None,
+        outputs=[transcript_box, language_box],
+        queue=True,
+        concurrency_limit=None,
+    )
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multilingual speech-to-text server.")
+    parser.add_argument(
+        "--chunk_ms",
+        "--chunk-ms",
+        type=int,
+        default=CHUNK_MS,
+        help="Steady-state audio request size in milliseconds.",
+    )
+    parser.add_argument(
+        "--languages",
+        default=",".join(LANGUAGE_CODES),
+        help=(
+            "Comma-separated language codes to detect, primary first. "
+            f"Supported: {', '.join(SUPPORTED_LANGUAGE_CODES)}. "
+            "Every extra language adds recognition latency."
+        ),
+    )
+    parser.add_argument(
+        "--model",
+        default=RECOGNITION_MODEL,
+        help="Google recognition model, e.g. latest_short, latest_long or default.",
+    )
+    args = parser.parse_args()
+    CHUNK_MS = max(FRAME_MS, args.chunk_ms)
+    LANGUAGE_CODES = [code.strip() for code in args.languages.split(",") if code.strip()]
+    if not LANGUAGE_CODES:
+        parser.error("--languages needs at least one language code")
+    RECOGNITION_MODEL = args.model
+
     print("🚀 Starting Multilingual Speech-to-Text Server...")
     print("📊 Features enabled:")
-    print("   🌍 Multi-language support (8 languages)")
+    print(f"   🌍 Multi-language support ({', '.join(LANGUAGE_CODES)})")
     print("   🔄 Mid-speech language switching")
     print("   🏷️  Language markers in transcript")
     print("   ⚡ Real-time detection")
-    print("   ⏱️  100ms update interval")
+    print("   ⏱️  Updates pushed as soon as the transcript changes")
     print("\n💡 TIP: Pause briefly when switching languages for best results!")
     print("🌐 Opening browser at http://localhost:7860")
 
@@ -1,9 +1,29 @@
 import speech_recognition as sr
-import pandas as pd
 import threading
+import pickle
+import csv
 import re
 import time
 import os
+from types import MappingProxyType
+
+# Transcript tokenizer: words and the punctuation kept between them
+_TOKEN_RE = re.compile(r"[\w']+|[.,!?;]")
+_PUNCT = frozenset(".,!?;")
+
+# Sample dictionaries used when the CSV files are missing (read-only)
+SAMPLE_DICTIONARIES = MappingProxyType({
+    'hi_data_cleaned.csv': MappingProxyType({
+        'dosto': 'दोस्तों', 'aaj': 'आज', 'mausam': 'मौसम', 'accha': 'अच्छा',
+        'kal': 'कल', 'kya': 'क्या', 'tum': 'तुम', 'office': 'ऑफिस', 'rahe': 'रहे', 'ho': 'हो',
+        'namaste': 'नमस्ते', 'dhanyawad': 'धन्यवाद', 'main': 'मैं', 'tha': 'था', 'thi': 'थी'
+    }),
+    'gu_data_cleaned.csv': MappingProxyType({
+        'kem': 'કેમ', 'cho': 'છો', 'che': 'છે', 'tame': 'તમે', 'kyā': 'ક્યાં', 
+        'jaī': 'જઈ', 'rahyā': 'રહ્યા', 'baje': 'બજે', 'hu': 'હું', 'chhu': 'છું',
+        'chhe': 'છે', 'aavu': 'આવું', 'padharo': 'પધારો'
+    }),
+})
 
 class TerminalMultilingualASR:
     def __init__(self):
@@ -11,9 +31,10 @@ class TerminalMultilingualASR:
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
         
-        # Load dictionaries
-        self.hindi_dict = self.load_dictionary('hi_data_cleaned.csv')
-        self.gujarati_dict = self.load_dictionary('gu_data_cleaned.csv')
+        # Load dictionaries into one lexicon (Hindi wins on collision)
+        hindi_dict = self.load_dictionary('hi_data_cleaned.csv')
+        gujarati_dict = self.load_dictionary('gu_data_cleaned.csv')
+        self.lex = {**gujarati_dict, **hindi_dict}
         
         # Control variables
         self.is_recording = False
@@ -26,48 +47,54 @@ class TerminalMultilingualASR:
         """Load dictionary from CSV file with fallback to sample data"""
         try:
             if os.path.exists(filename):
-                df = pd.read_csv(filename)
-                return dict(zip(df.iloc[:, 0], df.iloc[:, 1]))
+                # Reuse the pickled dictionary while it is newer than the CSV
+                cache = filename + ".pkl"
+                if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(filename):
+                    try:
+                        with open(cache, "rb") as f:
+                            return pickle.load(f)
+                    except (OSError, EOFError, pickle.UnpicklingError) as e:
+                        print(f"Ignoring unreadable cache {cache}: {e}")
+                
+                with open(filename, newline="", encoding="utf-8") as f:
+                    reader = csv.reader(f)
+                    next(reader, None)  # Skip the header row
+                    dictionary = {row[0]: row[1] for row in reader if len(row) >= 2}
+                
+                try:
+                    with open(cache, "wb") as f:
+                        pickle.dump(dictionary, f, protocol=pickle.HIGHEST_PROTOCOL)
+                except OSError as e:
+                    print(f"Could not cache dictionary {filename}: {e}")
+                return dictionary
             else:
-                # Create sample dictionary if file doesn't exist
-                sample_data = {
-                    'hi_data_cleaned.csv': {
-                        'dosto': 'दोस्तों', 'aaj': 'आज', 'mausam': 'मौसम', 'accha': 'अच्छा',
-                        'kal': 'कल', 'kya': 'क्या', 'tum': 'तुम', 'office': 'ऑफिस', 'rahe': 'रहे', 'ho': 'हो',
-                        'namaste': 'नमस्ते', 'dhanyawad': 'धन्यवाद', 'main': 'मैं', 'tha': 'था', 'thi': 'थी'
-                    },
-                    'gu_data_cleaned.csv': {
-                        'kem': 'કેમ', 'cho': 'છો', 'che': 'છે', 'tame': 'તમે', 'kyā': 'ક્યાં', 
-                        'jaī': 'જઈ', 'rahyā': 'રહ્યા', 'baje': 'બજે', 'hu': 'હું', 'chhu': 'છું',
-                        'kem': 'કેમ', 'chhe': 'છે', 'aavu': 'આવું', 'padharo': 'પધારો'
-                    }
-                }
-                return sample_data.get(filename, {})
+                # Fall back to the sample dictionary if file doesn't exist
+                return SAMPLE_DICTIONARIES.get(filename, {})
         except Exception as e:
             print(f"Error loading dictionary {filename}: {e}")
             return {}
     
     def map_languages(self, text):
         """Map Romanized words to native scripts"""
-        words = re.findall(r"[\w']+|[.,!?;]", text)
-        result = []
+        get = self.lex.get
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Some characters (e.g. "İ") change length when lowercased
+            return " ".join([
+                word if word[0] in _PUNCT else get(word.lower(), word)
+                for word in _TOKEN_RE.findall(text)
+            ])
         
-        for word in words:
-            # Skip punctuation
-            if re.match(r"[.,!?;]", word):
-                result.append(word)
-                continue
-                
-            # Check in Hindi dictionary
-            if word.lower() in self.hindi_dict:
-                result.append(self.hindi_dict[word.lower()])
-            # Check in Gujarati dictionary
-            elif word.lower() in self.gujarati_dict:
-                result.append(self.gujarati_dict[word.lower()])
+        # Lowercase once and slice each word's key out of it; unmapped
+        # words keep their original case
+        words = []
+        for match in _TOKEN_RE.finditer(text):
+            word = match.group()
+            if word[0] in _PUNCT:
+                words.append(word)
             else:
-                result.append(word)
-        
-        return " ".join(result)
+                words.append(get(lowered[match.start():match.end()], word))
+        return " ".join(words)
     
     def start_recording(self):
         """Start recording and processing audio"""
@@ -0,0 +1,410 @@
+import atexit
+import functools
+import queue
+import socket
+import threading
+import pyaudio
+from typing import Callable, Optional
+
+try:
+    # orjson is several times faster than json on the per-message hot path.
+    import orjson
+
+    def json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    json_loads = orjson.loads
+except ImportError:
+    from json import dumps as json_dumps, loads as json_loads
+
+try:
+    # websockets' C extension XOR-masks outgoing frames; without it every
+    # audio frame is masked in pure Python.
+    from websockets.speedups import apply_mask  # noqa: F401
+
+    WEBSOCKETS_SPEEDUPS = True
+except ImportError:
+    WEBSOCKETS_SPEEDUPS = False
+
+# Soniox WebSocket endpoint
+SONIOX_WEBSOCKET_URL = "wss://stt-rt.soniox.com/transcribe-websocket"
+
+# Audio recording parameters (Soniox recommends 16kHz, 16-bit PCM)
+FORMAT = pyaudio.paInt16
+CHANNELS = 1
+RATE = 16000
+# Frame size. Soniox accepts 3840-byte (120ms) chunks, but sending 20ms frames
+# (320 samples * 2 bytes = 640 bytes) gets audio in flight sooner.
+CHUNK = RATE * 20 // 1000 # Calculate number of frames per chunk
+# Chunks buffered between the capture callback and the sender (~480ms).
+BUFFER_CHUNKS = 24
+# Socket buffer sizes: a small send buffer keeps queued audio (and so
+# latency) bounded; a larger receive buffer absorbs bursts of transcript JSON.
+SOCKET_SNDBUF = 64 * 1024
+SOCKET_RCVBUF = 256 * 1024
+
+LANGUAGE_HINTS = ("en", "es", "hi")
+
+# Context profiles to improve recognition of difficult and rare words.
+# Whitespace is collapsed once here so it isn't sent with every session.
+MEDICAL_CONTEXT = " ".join("""
+    Celebrex, Zyrtec, Xanax, Prilosec, Amoxicillin Clavulanate Potassium
+""".split())
+INSURANCE_CONTEXT = " ".join("""
+    The customer, Maria Lopez, contacted BrightWay Insurance to update her auto policy
+    after purchasing a new vehicle.
+""".split())
+CONTEXT_PROFILES = {
+    "none": "",
+    "medical": MEDICAL_CONTEXT,
+    "insurance": INSURANCE_CONTEXT,
+    "medical_insurance": f"{MEDICAL_CONTEXT} {INSURANCE_CONTEXT}",
+}
+
+
+def warn_without_speedups() -> None:
+    if not WEBSOCKETS_SPEEDUPS:
+        print("Warning: websockets speedups are unavailable; install a binary websockets wheel for faster sends.")
+
+
+# Get Soniox STT config.
+def get_config(
+    api_key: str,
+    audio_format: str,
+    translation: str,
+    context: str = "",
+    language_hints: tuple[str, ...] = LANGUAGE_HINTS,
+) -> dict:
+    config = {
+        # Get your API key at console.soniox.com, then run: export SONIOX_API_KEY=<YOUR_API_KEY>
+        "api_key": api_key,
+        #
+        # Select the model to use.
+        # See: soniox.com/docs/stt/models
+        "model": "stt-rt-preview",
+        #
+        # Set language hints when possible to significantly improve accuracy.
+        # See: soniox.com/docs/stt/concepts/language-hints
+        "language_hints": list(language_hints),
+        #
+        # Enable language identification. Each token will include a "language" field.
+        # See: soniox.com/docs/stt/concepts/language-identification
+        "enable_language_identification": True,
+        #
+        # Enable speaker diarization. Each token will include a "speaker" field.
+        # See: soniox.com/docs/stt/concepts/speaker-diarization
+        "enable_speaker_diarization": True,
+        #
+        # Use endpointing to detect when the speaker stops.
+        # It finalizes all non-final tokens right away, minimizing latency.
+        # See: soniox.com/docs/stt/rt/endpoint-detection
+        "enable_endpoint_detection": True,
+    }
+
+    # Set context to improve recognition of difficult and rare words.
+    # Context is a string and can include words, phrases, sentences, or summaries (limit: 10K chars).
+    # It is only sent when a profile asks for it, since the server processes it on every session.
+    # See: soniox.com/docs/stt/concepts/context
+    if context:
+        config["context"] = context
+
+    # Audio format.
+    # See: soniox.com/docs/stt/rt/real-time-transcription#audio-formats
+    if audio_format == "auto":
+        # Set to "auto" to let Soniox detect the audio format automatically.
+        config["audio_format"] = "auto"
+    elif audio_format == "pcm_s16le":
+        # Example of a raw audio format; Soniox supports many others as well.
+        config["audio_format"] = "pcm_s16le"
+        config["sample_rate"] = 16000
+        config["num_channels"] = 1
+    else:
+        raise ValueError(f"Unsupported audio_format: {audio_format}")
+
+    # Translation options.
+    # See: soniox.com/docs/stt/rt/real-time-translation#translation-modes
+    if translation == "none":
+        pass
+    elif translation == "one_way":
+        # Translates all languages into the target language.
+        config["translation"] = {
+            "type": "one_way",
+            "target_language": "es",
+        }
+    elif translation == "two_way":
+        # Translates from language_a to language_b and back from language_b to language_a.
+        config["translation"] = {
+            "type": "two_way",
+            "language_a": "en",
+            "language_b": "es",
+        }
+    else:
+        raise ValueError(f"Unsupported translation: {translation}")
+
+    return config
+
+
+# Serialized config minus its leading '{"api_key": ...,'. Everything but the
+# API key depends only on these options, so it is serialized once per
+# combination and shared by every session in the process.
+@functools.lru_cache(maxsize=None)
+def _config_tail(
+    audio_format: str, translation: str, context: str, language_hints: tuple[str, ...]
+) -> str:
+    config = get_config("", audio_format, translation, context, language_hints)
+    del config["api_key"]
+    return json_dumps(config)[1:]
+
+
+# Get Soniox STT config as the JSON text sent to start a session.
+def get_config_json(
+    api_key: str,
+    audio_format: str,
+    translation: str,
+    context: str = "",
+    language_hints: tuple[str, ...] = LANGUAGE_HINTS,
+) -> str:
+    return (
+        '{"api_key":'
+        + json_dumps(api_key)
+        + ","
+        + _config_tail(audio_format, translation, context, language_hints)
+    )
+
+
+# Disable Nagle's algorithm so each small audio frame is sent immediately
+# instead of waiting to be coalesced with the next one, and size the socket
+# buffers for a steady upstream and bursty downstream.
+def tune_socket(ws) -> None:
+    try:
+        ws.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except (AttributeError, OSError) as e:
+        print(f"Warning: Could not set TCP_NODELAY: {e}")
+    try:
+        ws.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SNDBUF)
+        ws.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
+    except (AttributeError, OSError) as e:
+        print(f"Warning: Could not set socket buffer sizes: {e}")
+
+
+# PortAudio initialization enumerates audio devices and is slow, so one
+# PyAudio instance is created on first use and shared by every session.
+_pyaudio = None
+_pyaudio_lock = threading.Lock()
+
+
+def get_pyaudio() -> pyaudio.PyAudio:
+    global _pyaudio
+    with _pyaudio_lock:
+        if _pyaudio is None:
+            _pyaudio = pyaudio.PyAudio()
+            atexit.register(_pyaudio.terminate)
+        return _pyaudio
+
+
+def stop_sender(buffer: queue.Queue) -> None:
+    """Queue the None sentinel that ends the sender loop, even when full."""
+    while True:
+        try:
+            buffer.put_nowait(None)
+            return
+        except queue.Full:
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                pass
+
+
+# Capture audio from the microphone and send its bytes to the websocket.
+# PyAudio runs in callback mode: PortAudio captures on its own thread and
+# hands each chunk to fill_buffer, so capture never waits on the GIL or a
+# slow send. This thread only drains the buffer and sends.
+# With send_batch > 1, chunks already waiting in the buffer are joined into
+# one websocket frame (up to send_batch chunks) to save per-frame overhead.
+def stream_audio_from_mic(
+    ws, stop_event, send_batch: int = 1, verbose: bool = False
+) -> None:
+    audio = get_pyaudio()
+    buffer: queue.Queue = queue.Queue(maxsize=BUFFER_CHUNKS)
+
+    def fill_buffer(in_data, frame_count, time_info, status_flags):
+        if stop_event.is_set():
+            # Wake the sender within one frame instead of a get() timeout.
+            stop_sender(buffer)
+            return None, pyaudio.paComplete
+        try:
+            buffer.put_nowait(in_data)
+        except queue.Full:
+            pass  # Sender is stalled; drop this chunk rather than block capture.
+        return None, pyaudio.paContinue
+
+    try:
+        # Open microphone stream; PortAudio hands fill_buffer each CHUNK of
+        # audio on its own thread, so capture never waits on the socket.
+        stream = audio.open(
+            format=FORMAT,
+            channels=CHANNELS,
+            rate=RATE,
+            input=True,
+            frames_per_buffer=CHUNK,
+            stream_callback=fill_buffer,
+        )
+
+        if verbose:
+            print("Microphone opened. Start speaking...")
+
+        try:
+            stopping = False
+            while not stopping:
+                try:
+                    data = buffer.get(timeout=0.5)
+                except queue.Empty:
+                    if stop_event.is_set():
+                        break
+                    continue
+                if data is None:
+                    break
+                if send_batch > 1:
+                    # Never wait for more audio; only coalesce what is queued.
+                    batch = [data]
+                    while len(batch) < send_batch:
+                        try:
+                            data = buffer.get_nowait()
+                        except queue.Empty:
+                            break
+                        if data is None:
+                            stopping = True
+                            break
+                        batch.append(data)
+                    data = b"".join(batch)
+                # Send the audio data to the Soniox WebSocket server
+                ws.send(data)
+        finally:
+            if verbose:
+                print("Stopping microphone stream...")
+            # PyAudio outlives the session, so close the stream ourselves.
+            stream.stop_stream()
+            stream.close()
+
+    finally:
+        # Send an empty frame to signal end-of-audio to the server
+        try:
+            ws.send(b"") # Send empty binary frame
+        except Exception as e:
+            print(f"Error sending end frame: {e}")
+
+
+# Append one token to text_parts, adding speaker/language tags as needed.
+# Returns the (speaker, language) state to continue rendering from.
+def render_token(
+    token: dict,
+    state: tuple[Optional[str], Optional[str]],
+    text_parts: list[str],
+) -> tuple[Optional[str], Optional[str]]:
+    current_speaker, current_language = state
+    get = token.get  # Bound once; render runs for every token of every message.
+    text = token["text"]
+    speaker = get("speaker")
+    language = get("language")
+
+    # Speaker changed -> add a speaker tag.
+    if speaker is not None and speaker != current_speaker:
+        if current_speaker is not None:
+            text_parts.append("\n\n")
+        current_speaker = speaker
+        current_language = None  # Reset language on speaker changes.
+        text_parts.append(f"Speaker {current_speaker}:")
+
+    # Language changed -> add a language or translation tag.
+    if language is not None and language != current_language:
+        current_language = language
+        prefix = "[Translation] " if get("translation_status") == "translation" else ""
+        text_parts.append(f"\n{prefix}[{current_language}] ")
+        text = text.lstrip()
+
+    text_parts.append(text)
+    return current_speaker, current_language
+
+
+# Convert tokens into a readable transcript.
+# Final tokens never change once received, so their rendering is cached and
+# extended as they arrive; each message only renders its non-final tail.
+class TokenRenderer:
+    def __init__(self) -> None:
+        # Rendered finals as UTF-8. A bytearray grows in place, whereas str +=
+        # copies the whole transcript for every final token.
+        self._final_buf = bytearray()
+        self._final_text = (0, "")  # (byte length, decoded text)
+        self.final_state: tuple[Optional[str], Optional[str]] = (None, None)
+
+    def append_final(self, token: dict) -> None:
+        text_parts: list[str] = []
+        self.final_state = render_token(token, self.final_state, text_parts)
+        self._final_buf += "".join(text_parts).encode("utf-8")
+
+    # Decoded once per batch of new final tokens, not once per message.
+    def final_rendered(self, length: Optional[int] = None) -> str:
+        if length is None:
+            length = len(self._final_buf)
+        cached_length, text = self._final_text
+        if cached_length != length:
+            text = self._final_buf[:length].decode("utf-8")
+            self._final_text = (length, text)
+        return text
+
+    # Everything needed to render the transcript as of now. The final buffer
+    # is append-only, so its current length pins a consistent prefix even if
+    # another thread renders the snapshot while more finals arrive.
+    def snapshot(self, non_final_tokens: list[dict]) -> tuple:
+        return len(self._final_buf), self.final_state, non_final_tokens
+
+    def render_snapshot(self, snapshot: tuple) -> str:
+        final_length, state, non_final_tokens = snapshot
+        text_parts: list[str] = [self.final_rendered(final_length)]
+        for token in non_final_tokens:
+            state = render_token(token, state, text_parts)
+
+        return "".join(text_parts)
+
+    def render(self, non_final_tokens: list[dict]) -> str:
+        return self.render_snapshot(self.snapshot(non_final_tokens))
+
+
+# Read responses until the session ends, appending final tokens to renderer
+# and calling on_tokens with each response's non-final tokens.
+# Returns the error response from the server, or None once it has finished
+# (or stop_event is set). Connection errors propagate to the caller.
+# See: https://soniox.com/docs/stt/api-reference/websocket-api#error-response
+def recv_loop(
+    ws,
+    renderer: TokenRenderer,
+    on_tokens: Callable[[list[dict]], None],
+    stop_event: Optional[threading.Event] = None,
+) -> Optional[dict]:
+    # Bound once; the token loop below runs for every message.
+    append_final = renderer.append_final
+    while stop_event is None or not stop_event.is_set():
+        res = json_loads(ws.recv(decode=False))
+
+        # Error from server.
+        if res.get("error_code") is not None:
+            return res
+
+        # Parse tokens from current response.
+        non_final_tokens: list[dict] = []
+        append_non_final = non_final_tokens.append
+        for token in res.get("tokens", ()):
+            if token.get("text"):
+                if token.get("is_final"):
+                    # Final tokens are returned once; render them into the cached prefix.
+                    append_final(token)
+                else:
+                    # Non-final tokens update as more audio arrives; reset them on every response.
+                    append_non_final(token)
+
+        on_tokens(non_final_tokens)
+
+        # Session finished.
+        if res.get("finished"):
+            return None
+    return None
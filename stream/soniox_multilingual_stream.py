@@ -1,24 +1,56 @@
 
+import asyncio
+import csv
 import json
 import os
-import threading
+import pickle
 import time
 import argparse
 import pyaudio
-import pandas as pd
 import re
+from types import MappingProxyType
 from typing import Optional
-from websockets.sync.client import connect
+from websockets.asyncio.client import connect
 from websockets.exceptions import ConnectionClosedOK
 
-# Soniox WebSocket endpoint
-SONIOX_WEBSOCKET_URL = "wss://stt-rt.soniox.com/transcribe-websocket"
+from soniox_core import (
+    CHANNELS,
+    FORMAT,
+    RATE,
+    SONIOX_WEBSOCKET_URL,
+    json_loads,
+    warn_without_speedups,
+)
 
-# Audio recording parameters
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
-RATE = 16000
-CHUNK = 3840 // 2 // 1  # 120ms of audio
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Audio recording parameters (format, channels and rate come from soniox_core)
+FRAME_MS = 20  # Capture granularity; the first send goes out after one frame
+CHUNK = RATE * FRAME_MS // 1000  # 20ms of audio
+CHUNK_MS = 120  # Steady-state send size, see --chunk_ms
+BUFFER_MS = 360  # Captured audio held while a send is in flight
+DISPLAY_INTERVAL = 0.05  # Seconds between interim redraws (at most 20Hz)
+
+# Transcript tokenizer: words and the punctuation kept between them.
+_TOKEN_RE = re.compile(r"[\w']+|[.,!?;]")
+_PUNCT = frozenset(".,!?;")
+
+# Fallback dictionaries used when the CSV files are missing (read-only).
+SAMPLE_DICTIONARIES = MappingProxyType({
+    'hi_data_cleaned.csv': MappingProxyType({
+        'dosto': 'दोस्तों', 'aaj': 'आज', 'mausam': 'मौसम', 'accha': 'अच्छा',
+        'kal': 'कल', 'kya': 'क्या', 'tum': 'तुम', 'office': 'ऑफिस', 'rahe': 'रहे', 'ho': 'हो',
+        'namaste': 'नमस्ते', 'dhanyawad': 'धन्यवाद', 'main': 'मैं', 'tha': 'था', 'thi': 'थी'
+    }),
+    'gu_data_cleaned.csv': MappingProxyType({
+        'kem': 'કેમ', 'cho': 'છો', 'che': 'છે', 'tame': 'તમે', 'kyā': 'ક્યાં',
+        'jaī': 'જઈ', 'rahyā': 'રહ્યા', 'baje': 'બજે', 'hu': 'હું', 'chhu': 'છું',
+        'chhe': 'છે', 'aavu': 'આવું', 'padharo': 'પધારો'
+    }),
+})
 
 def get_config(api_key: str, audio_format: str) -> dict:
     """Get Soniox STT config."""
@@ -41,149 +73,226 @@ def get_config(api_key: str, audio_format: str) -> dict:
     return config
 
 def load_dictionary(filename: str) -> dict:
-    """Load dictionary from CSV file with fallback to sample data."""
+    """Load dictionary from CSV file with fallback to sample data.
+
+    The parsed CSV is cached next to it as ``<csv>.pkl`` and reused for as
+    long as the cache is newer than the CSV.
+    """
     try:
         if os.path.exists(filename):
-            df = pd.read_csv(filename)
-            return dict(zip(df.iloc[:, 0], df.iloc[:, 1]))
+            cache = filename + ".pkl"
+            if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(filename):
+                try:
+                    with open(cache, "rb") as f:
+                        return pickle.load(f)
+                except (OSError, EOFError, pickle.UnpicklingError) as e:
+                    print(f"Warning: Ignoring unreadable cache '{cache}': {e}")
+            with open(filename, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                next(reader, None)  # Skip the header row
+                dictionary = {row[0]: row[1] for row in reader if len(row) >= 2}
+            try:
+                with open(cache, "wb") as f:
+                    pickle.dump(dictionary, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError as e:
+                print(f"Warning: Could not cache dictionary '{filename}': {e}")
+            return dictionary
         else:
             print(f"Warning: Dictionary file '{filename}' not found. Using sample data.")
-            sample_data = {
-                'hi_data_cleaned.csv': {
-                    'dosto': 'दोस्तों', 'aaj': 'आज', 'mausam': 'मौसम', 'accha': 'अच्छा',
-                    'kal': 'कल', 'kya': 'क्या', 'tum': 'तुम', 'office': 'ऑफिस', 'rahe': 'रहे', 'ho': 'हो',
-                    'namaste': 'नमस्ते', 'dhanyawad': 'धन्यवाद', 'main': 'मैं', 'tha': 'था', 'thi': 'थी'
-                },
-                'gu_data_cleaned.csv': {
-                    'kem': 'કેમ', 'cho': 'છો', 'che': 'છે', 'tame': 'તમે', 'kyā': 'ક્યાં',
-                    'jaī': 'જઈ', 'rahyā': 'રહ્યા', 'baje': 'બજે', 'hu': 'હું', 'chhu': 'છું',
-                    'chhe': 'છે', 'aavu': 'આવું', 'padharo': 'પધારો'
-                }
-            }
-            return sample_data.get(filename, {})
+            return SAMPLE_DICTIONARIES.get(filename, {})
     except Exception as e:
         print(f"Error loading dictionary {filename}: {e}")
         return {}
 
-def map_languages(text: str, hindi_dict: dict, gujarati_dict: dict) -> str:
+def merge_dictionaries(hindi_dict: dict, gujarati_dict: dict) -> dict:
+    """Merge both dictionaries into one lexicon; Hindi wins on collision."""
+    return {**gujarati_dict, **hindi_dict}
+
+def map_languages(text: str, lexicon: dict) -> str:
     """Map Romanized words to native scripts."""
-    words = re.findall(r"[\w']+|[.,!?;]", text)
-    result = []
-    for word in words:
-        if re.match(r"[.,!?;]", word):
-            result.append(word)
-            continue
-        
-        lower_word = word.lower()
-        if lower_word in hindi_dict:
-            result.append(hindi_dict[lower_word])
-        elif lower_word in gujarati_dict:
-            result.append(gujarati_dict[lower_word])
+    get = lexicon.get
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters (e.g. "İ") change length when lowercased, which
+        # would misalign the offsets; lowercase word by word instead.
+        return " ".join([
+            word if word[0] in _PUNCT else get(word.lower(), word)
+            for word in _TOKEN_RE.findall(text)
+        ])
+
+    # Lowercase the transcript once and slice each word's key out of it;
+    # unmapped words keep their original case.
+    words = []
+    for match in _TOKEN_RE.finditer(text):
+        word = match.group()
+        if word[0] in _PUNCT:
+            words.append(word)
         else:
-            result.append(word)
-    return " ".join(result)
+            words.append(get(lowered[match.start():match.end()], word))
+    return " ".join(words)
+
+async def stream_audio_from_mic(
+    ws,
+    chunk_ms: int = CHUNK_MS,
+    endpoint_event: Optional[asyncio.Event] = None,
+) -> None:
+    """Capture audio from the microphone and send its bytes to the websocket.
 
-def stream_audio_from_mic(ws, stop_event: threading.Event) -> None:
-    """Capture audio from the microphone and send its bytes to the websocket."""
+    PyAudio runs in callback mode: PortAudio hands each chunk to the event
+    loop, which queues it for this task to send. Runs until cancelled.
+
+    Sends use progressive framing: 20ms, then 40ms, 80ms, ... up to
+    ``chunk_ms``, restarting at 20ms whenever ``endpoint_event`` is set.
+    """
+    loop = asyncio.get_running_loop()
     audio = pyaudio.PyAudio()
+    buffer: asyncio.Queue = asyncio.Queue(maxsize=BUFFER_MS // FRAME_MS)
+    chunk_ms = max(FRAME_MS, chunk_ms)
+
+    def put(in_data: bytes) -> None:
+        try:
+            buffer.put_nowait(in_data)
+        except asyncio.QueueFull:
+            pass
+
+    def fill_buffer(in_data, frame_count, time_info, status_flags):
+        # Called on the PortAudio thread; hand the chunk over to the loop.
+        loop.call_soon_threadsafe(put, in_data)
+        return None, pyaudio.paContinue
+
     try:
+        # Open microphone stream
         stream = audio.open(
             format=FORMAT,
             channels=CHANNELS,
             rate=RATE,
             input=True,
             frames_per_buffer=CHUNK,
+            stream_callback=fill_buffer,
         )
         print("Microphone opened. Start speaking...")
-        while not stop_event.is_set():
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            ws.send(data)
-        print("Stopping microphone stream...")
-        stream.stop_stream()
-        stream.close()
+        frame_ms = FRAME_MS
+        pending: list[bytes] = []
+        try:
+            while True:
+                pending.append(await buffer.get())
+                if len(pending) * FRAME_MS < frame_ms:
+                    continue
+                await ws.send(b"".join(pending))
+                pending.clear()
+                if endpoint_event is not None and endpoint_event.is_set():
+                    endpoint_event.clear()
+                    frame_ms = FRAME_MS
+                else:
+                    frame_ms = min(frame_ms * 2, chunk_ms)
+        finally:
+            print("Stopping microphone stream...")
+            stream.stop_stream()
+            stream.close()
     finally:
         audio.terminate()
         try:
-            ws.send(b"")  # Send empty binary frame to signal end of audio
+            await ws.send(b"")  # Send empty binary frame to signal end of audio
         except Exception as e:
             print(f"Error sending end frame: {e}")
 
-def run_session(api_key: str, audio_format: str) -> None:
-    """Load dictionaries and run the real-time transcription session."""
-    print("Loading dictionaries...")
-    hindi_dict = load_dictionary('hi_data_cleaned.csv')
-    gujarati_dict = load_dictionary('gu_data_cleaned.csv')
-    print("Dictionaries loaded.")
+async def receive_transcripts(ws, lexicon: dict, endpoint_event: asyncio.Event) -> None:
+    """Print mapped transcriptions until the server finishes the session."""
+    # Interim-only frames are coalesced and redrawn at most every
+    # DISPLAY_INTERVAL; frames with final text are always shown.
+    last_print = 0.0
 
-    config = get_config(api_key, audio_format)
+    while True:
+        message = await ws.recv(decode=False)
+        res = json_loads(message)
 
-    print("Connecting to Soniox...")
-    try:
-        with connect(SONIOX_WEBSOCKET_URL) as ws:
-            ws.send(json.dumps(config))
+        if res.get("error_code") is not None:
+            print(f"Error: {res['error_code']} - {res['error_message']}")
+            break
 
-            stop_event = threading.Event()
-            audio_thread = threading.Thread(
-                target=stream_audio_from_mic,
-                args=(ws, stop_event),
-                daemon=True,
-            )
-            audio_thread.start()
+        # Split final and non-final text in a single pass.
+        final_parts: list[str] = []
+        non_final_parts: list[str] = []
+        for token in res.get("tokens", ()):
+            (final_parts if token.get("is_final") else non_final_parts).append(token["text"])
 
-            print("Session started. Press Ctrl+C to stop.")
-            
-            try:
-                while True:
-                    message = ws.recv()
-                    res = json.loads(message)
+        # Endpoint reached: restart progressive framing.
+        if "<end>" in final_parts:
+            endpoint_event.set()
 
-                    if res.get("error_code") is not None:
-                        print(f"Error: {res['error_code']} - {res['error_message']}")
-                        break
+        now = time.monotonic()
+        if final_parts or res.get("finished") or now - last_print >= DISPLAY_INTERVAL:
+            last_print = now
+            final_text = "".join(final_parts)
+            non_final_text = "".join(non_final_parts)
 
-                    all_tokens = res.get("tokens", [])
-                    final_tokens = [t for t in all_tokens if t.get("is_final")]
-                    non_final_tokens = [t for t in all_tokens if not t.get("is_final")]
+            mapped_final_text = map_languages(final_text, lexicon)
+            mapped_non_final_text = map_languages(non_final_text, lexicon)
 
-                    final_text = "".join(t["text"] for t in final_tokens)
-                    non_final_text = "".join(t["text"] for t in non_final_tokens)
+            # Overwrite the current line with the latest transcription
+            print(f"{mapped_final_text}{mapped_non_final_text}" + " " * 20, end='\r')
 
-                    mapped_final_text = map_languages(final_text, hindi_dict, gujarati_dict)
-                    mapped_non_final_text = map_languages(non_final_text, hindi_dict, gujarati_dict)
+        if res.get("finished"):
+            print("\nSession finished by server.")
+            break
 
-                    # Overwrite the current line with the latest transcription
-                    print(f"{mapped_final_text}{mapped_non_final_text}" + " " * 20, end='\r')
+async def transcribe(config: dict, lexicon: dict, chunk_ms: int = CHUNK_MS) -> None:
+    """Stream microphone audio to Soniox and print transcriptions concurrently."""
+    print("Connecting to Soniox...")
+    try:
+        async with connect(SONIOX_WEBSOCKET_URL) as ws:
+            await ws.send(json.dumps(config))
 
-                    if res.get("finished"):
-                        print("\nSession finished by server.")
-                        break
+            endpoint_event = asyncio.Event()
+            audio_task = asyncio.create_task(stream_audio_from_mic(ws, chunk_ms, endpoint_event))
 
-            except KeyboardInterrupt:
-                print("\nInterrupted by user. Stopping...")
+            print("Session started. Press Ctrl+C to stop.")
+            try:
+                await receive_transcripts(ws, lexicon, endpoint_event)
             except ConnectionClosedOK:
                 print("\nConnection closed normally.")
             except Exception as e:
                 print(f"Error: {e}")
             finally:
-                stop_event.set()
-                audio_thread.join(timeout=2.0)
+                audio_task.cancel()
+                await asyncio.wait({audio_task}, timeout=2.0)
 
     except Exception as e:
         print(f"Failed to connect: {e}")
 
+def run_session(api_key: str, audio_format: str, chunk_ms: int = CHUNK_MS) -> None:
+    """Load dictionaries and run the real-time transcription session."""
+    print("Loading dictionaries...")
+    hindi_dict = load_dictionary('hi_data_cleaned.csv')
+    gujarati_dict = load_dictionary('gu_data_cleaned.csv')
+    lexicon = merge_dictionaries(hindi_dict, gujarati_dict)
+    print("Dictionaries loaded.")
+
+    config = get_config(api_key, audio_format)
+
+    # uvloop's event loop wakes up faster than the default one where available.
+    run = uvloop.run if uvloop is not None else asyncio.run
+    try:
+        run(transcribe(config, lexicon, chunk_ms))
+    except KeyboardInterrupt:
+        print("\nInterrupted by user. Stopping...")
+
 def main():
     parser = argparse.ArgumentParser(description="Real-time multilingual transcription using Soniox.")
     parser.add_argument("--audio_format", default="pcm_s16le", help="Audio format for microphone.")
+    parser.add_argument("--chunk_ms", "--chunk-ms", type=int, default=CHUNK_MS, help="Steady-state audio send size in milliseconds.")
     args = parser.parse_args()
 
     api_key = os.environ.get("SONIOX_API_KEY")
     if api_key is None:
         raise RuntimeError("Missing SONIOX_API_KEY. Please set it as an environment variable.")
 
+    warn_without_speedups()
+
     if args.audio_format not in ["pcm_s16le", "auto"]:
         print(f"Warning: Using microphone with format '{args.audio_format}' might require specific configuration.")
 
-    run_session(api_key, args.audio_format)
+    run_session(api_key, args.audio_format, args.chunk_ms)
 
 if __name__ == "__main__":
     main()
@@ -1,160 +1,96 @@
-import json
 import os
+import sys
 import threading
-import time
-import argparse
-import pyaudio
-from typing import Optional
 from websockets.sync.client import connect
 from websockets.exceptions import ConnectionClosedOK
 import gradio as gr
 
-# Soniox WebSocket endpoint
-SONIOX_WEBSOCKET_URL = "wss://stt-rt.soniox.com/transcribe-websocket"
-
-# Audio recording parameters
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
-RATE = 16000
-CHUNK = 3840 // 2 // 1
+# Config, capture and rendering are shared with the CLI in stream/; append
+# rather than prepend so the directory can't shadow installed packages.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "stream"))
+from soniox_core import (  # noqa: E402
+    CONTEXT_PROFILES,
+    SONIOX_WEBSOCKET_URL,
+    TokenRenderer,
+    get_config_json,
+    recv_loop,
+    stream_audio_from_mic,
+    tune_socket,
+    warn_without_speedups,
+)
+
+LANGUAGE_HINTS = ("en", "es")
+# The UI has always sent both the medical and insurance context.
+DEFAULT_CONTEXT_PROFILE = "medical_insurance"
 
 
 class TranscriptionSession:
     def __init__(
-        self, api_key: str, audio_format: str = "pcm_s16le", translation: str = "none"
+        self,
+        api_key: str,
+        audio_format: str = "pcm_s16le",
+        translation: str = "none",
+        context_profile: str = DEFAULT_CONTEXT_PROFILE,
     ):
         self.api_key = api_key
         self.audio_format = audio_format
         self.translation = translation
+        self.context_profile = context_profile
         self.ws = None
         self.stop_event = threading.Event()
         self.audio_thread = None
         self.receive_thread = None
-        self.final_tokens = []
+        self.renderer = TokenRenderer()
         self.is_running = False
+        self.transcript_version = 0
+        self._rendered = (-1, "")  # (version, text) last rendered for the UI
         self.current_transcript = ""
 
-    def get_config(self) -> dict:
-        config = {
-            "api_key": self.api_key,
-            "model": "stt-rt-preview",
-            "language_hints": ["en", "es"],
-            "enable_language_identification": True,
-            "enable_speaker_diarization": True,
-            "context": """
-                Celebrex, Zyrtec, Xanax, Prilosec, Amoxicillin Clavulanate Potassium            
-                The customer, Maria Lopez, contacted BrightWay Insurance to update her auto policy 
-                after purchasing a new vehicle.
-            """,
-            "enable_endpoint_detection": True,
-        }
-
-        if self.audio_format == "auto":
-            config["audio_format"] = "auto"
-        elif self.audio_format == "pcm_s16le":
-            config["audio_format"] = "pcm_s16le"
-            config["sample_rate"] = 16000
-            config["num_channels"] = 1
-
-        if self.translation == "one_way":
-            config["translation"] = {
-                "type": "one_way",
-                "target_language": "es",
-            }
-        elif self.translation == "two_way":
-            config["translation"] = {
-                "type": "two_way",
-                "language_a": "en",
-                "language_b": "es",
-            }
-
-        return config
-
-    def stream_audio_from_mic(self) -> None:
-        audio = pyaudio.PyAudio()
+    @property
+    def current_transcript(self) -> str:
+        # Rendered lazily on the UI thread, at most once per version; the
+        # receive thread only publishes what to render.
+        version = self.transcript_version
+        rendered_version, text = self._rendered
+        if rendered_version != version:
+            snapshot = self._snapshot
+            if isinstance(snapshot, str):
+                text = snapshot
+            else:
+                renderer, tokens_snapshot = snapshot
+                text = renderer.render_snapshot(tokens_snapshot)
+            self._rendered = (version, text)
+        return text
+
+    @current_transcript.setter
+    def current_transcript(self, text: str) -> None:
+        # Bump the version so the UI only re-sends the transcript on change.
+        self._snapshot = text
+        self.transcript_version += 1
+
+    def get_config_json(self) -> str:
+        # Only the API key varies per session; the rest is serialized once.
+        return get_config_json(
+            self.api_key,
+            self.audio_format,
+            self.translation,
+            CONTEXT_PROFILES[self.context_profile],
+            LANGUAGE_HINTS,
+        )
 
-        try:
-            stream = audio.open(
-                format=FORMAT,
-                channels=CHANNELS,
-                rate=RATE,
-                input=True,
-                frames_per_buffer=CHUNK,
-            )
+    def receive_messages(self):
+        renderer = self.renderer
 
-            while not self.stop_event.is_set():
-                data = stream.read(CHUNK, exception_on_overflow=False)
-                if self.ws:
-                    self.ws.send(data)
-
-            stream.stop_stream()
-            stream.close()
-
-        finally:
-            audio.terminate()
-            try:
-                if self.ws:
-                    self.ws.send(b"")
-            except Exception as e:
-                print(f"Error sending end frame: {e}")
-
-    def render_tokens(
-        self, final_tokens: list[dict], non_final_tokens: list[dict]
-    ) -> str:
-        text_parts = []
-        current_speaker = None
-        current_language = None
-
-        for token in final_tokens + non_final_tokens:
-            text = token["text"]
-            speaker = token.get("speaker")
-            language = token.get("language")
-            is_translation = token.get("translation_status") == "translation"
-
-            if speaker is not None and speaker != current_speaker:
-                if current_speaker is not None:
-                    text_parts.append("\n\n")
-                current_speaker = speaker
-                current_language = None
-                text_parts.append(f"Speaker {current_speaker}:")
-
-            if language is not None and language != current_language:
-                current_language = language
-                prefix = "[Translation] " if is_translation else ""
-                text_parts.append(f"\n{prefix}[{current_language}] ")
-                text = text.lstrip()
-
-            text_parts.append(text)
-
-        return "".join(text_parts)
+        def publish(non_final_tokens: list[dict]) -> None:
+            self._snapshot = (renderer, renderer.snapshot(non_final_tokens))
+            self.transcript_version += 1
 
-    def receive_messages(self):
         try:
-            while not self.stop_event.is_set():
-                message = self.ws.recv()
-                res = json.loads(message)
-
-                if res.get("error_code") is not None:
-                    self.current_transcript = (
-                        f"Error: {res['error_code']} - {res['error_message']}"
-                    )
-                    break
-
-                non_final_tokens = []
-                for token in res.get("tokens", []):
-                    if token.get("text"):
-                        if token.get("is_final"):
-                            self.final_tokens.append(token)
-                        else:
-                            non_final_tokens.append(token)
-
-                self.current_transcript = self.render_tokens(
-                    self.final_tokens, non_final_tokens
+            error = recv_loop(self.ws, renderer, publish, self.stop_event)
+            if error is not None:
+                self.current_transcript = (
+                    f"Error: {error['error_code']} - {error['error_message']}"
                 )
-
-                if res.get("finished"):
-                    break
-
         except ConnectionClosedOK:
             pass
         except Exception as e:
@@ -167,16 +103,17 @@ class TranscriptionSession:
 
         try:
             self.ws = connect(SONIOX_WEBSOCKET_URL)
-            config = self.get_config()
-            self.ws.send(json.dumps(config))
+            tune_socket(self.ws)
+            self.ws.send(self.get_config_json())
 
             self.stop_event.clear()
-            self.final_tokens = []
+            self.renderer = TokenRenderer()
             self.current_transcript = "🎤 Listening... Start speaking!\n\n"
             self.is_running = True
 
             self.audio_thread = threading.Thread(
-                target=self.stream_audio_from_mic,
+                target=stream_audio_from_mic,
+                args=(self.ws, self.stop_event),
                 daemon=True,
             )
             self.audio_thread.start()
@@ -218,12 +155,12 @@ class TranscriptionSession:
 session = None
 
 
-def initialize_session():
+def initialize_session(context_profile: str = DEFAULT_CONTEXT_PROFILE):
     global session
     api_key = os.environ.get("SONIOX_API_KEY")
     if api_key is None:
         return "❌ SONIOX_API_KEY environment variable not set"
-    session = TranscriptionSession(api_key)
+    session = TranscriptionSession(api_key, context_profile=context_profile)
     return "✅ Ready to start transcription"
 
 
@@ -241,10 +178,17 @@ def stop_recording():
     return status, session.get_transcript()
 
 
-def update_transcript():
-    if session is None or not session.is_running:
-        return session.get_transcript() if session else ""
-    return session.get_transcript()
+def update_transcript(emitted):
+    # `emitted` is this client's (session id, transcript version) as of the
+    # last tick, or None before any session exists; skip re-sending an
+    # unchanged transcript to the browser. An idle or stopped session keeps
+    # its version, so idle ticks cost no render and no Textbox update.
+    current = None if session is None else (id(session), session.transcript_version)
+    if current == emitted:
+        return gr.update(), emitted
+    if current is None:
+        return "", None
+    return session.get_transcript(), current
 
 
 # Create Gradio interface
@@ -272,6 +216,12 @@ with gr.Blocks(title="Soniox Real-time Transcription", theme=gr.themes.Soft()) a
                 lines=2,
             )
 
+            context_dropdown = gr.Dropdown(
+                label="Recognition Context (applied on Initialize)",
+                choices=list(CONTEXT_PROFILES),
+                value=DEFAULT_CONTEXT_PROFILE,
+            )
+
             with gr.Row():
                 init_btn = gr.Button("🔧 Initialize", variant="secondary")
                 start_btn = gr.Button("🎤 Start Recording", variant="primary")
@@ -283,7 +233,7 @@ with gr.Blocks(title="Soniox Real-time Transcription", theme=gr.themes.Soft()) a
                 - ✅ Speaker Diarization
                 - ✅ Language Identification (EN/ES)
                 - ✅ Endpoint Detection
-                - ✅ Medical/Insurance Context
+                - ✅ Recognition Context (medical + insurance by default)
                 """
             )
 
@@ -297,7 +247,7 @@ with gr.Blocks(title="Soniox Real-time Transcription", theme=gr.themes.Soft()) a
             )
 
     # Event handlers
-    init_btn.click(fn=initialize_session, outputs=status_box)
+    init_btn.click(fn=initialize_session, inputs=context_dropdown, outputs=status_box)
 
     start_btn.click(fn=start_recording, outputs=[status_box, transcript_box])
 
@@ -306,11 +256,17 @@ with gr.Blocks(title="Soniox Real-time Transcription", theme=gr.themes.Soft()) a
     # Auto-update transcript every 500ms while recording
     # Using Timer for Gradio 4.x+
     try:
+        emitted_version = gr.State(None)
         timer = gr.Timer(0.5)
-        timer.tick(fn=update_transcript, outputs=transcript_box)
+        timer.tick(
+            fn=update_transcript,
+            inputs=emitted_version,
+            outputs=[transcript_box, emitted_version],
+        )
     except (AttributeError, TypeError):
         # Fallback for older Gradio versions
         pass
 
 if __name__ == "__main__":
+    warn_without_speedups()
     demo.launch(share=True, server_name="0.0.0.0", server_port=7860)
@@ -1,20 +1,20 @@
+import os
 from openai import OpenAI
 from dotenv import load_dotenv
-from prompt import prompt
+from prompt import prompt_short
 
 load_dotenv()
 
 client = OpenAI()
-audio_file = open(
-    "/home/anujkumar/work/Speech-To-Text-Models/whisper/da5b-cd90-478d-8cd5-3b2e700d4aaf.mp3",
-    "rb",
-)
+audio_path = "/home/anujkumar/work/Speech-To-Text-Models/whisper/da5b-cd90-478d-8cd5-3b2e700d4aaf.mp3"
 
-transcription = client.audio.transcriptions.create(
-    model="gpt-4o-transcribe",
-    file=audio_file,
-    # language=["hi", "en", "gu"],
-    prompt=prompt,
-)
+# Close the file once the request is done; the tuple sets the upload's filename and MIME type.
+with open(audio_path, "rb") as audio_file:
+    transcription = client.audio.transcriptions.create(
+        model="gpt-4o-transcribe",
+        file=(os.path.basename(audio_path), audio_file, "audio/mpeg"),
+        # language=["hi", "en", "gu"],
+        prompt=prompt_short,
+    )
 
 print(transcription.text)
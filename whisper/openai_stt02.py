@@ -1,3 +1,4 @@
+import os
 from openai import OpenAI
 from dotenv import load_dotenv
 from prompt import prompt
@@ -5,15 +6,14 @@ from prompt import prompt
 load_dotenv()
 
 client = OpenAI()
-audio_file = open(
-    "/home/anujkumar/work/Speech-To-Text-Models/whisper/da5b-cd90-478d-8cd5-3b2e700d4aaf.mp3",
-    "rb",
-)
+audio_path = "/home/anujkumar/work/Speech-To-Text-Models/whisper/da5b-cd90-478d-8cd5-3b2e700d4aaf.mp3"
 
-transcription = client.audio.transcriptions.create(
-    model="whisper-1",
-    file=audio_file,
-    # , prompt=prompt
-)
+# The with block closes the handle after the upload, and the tuple labels it as audio/mpeg.
+with open(audio_path, "rb") as audio_file:
+    transcription = client.audio.transcriptions.create(
+        model="whisper-1",
+        file=(os.path.basename(audio_path), audio_file, "audio/mpeg"),
+        # , prompt=prompt
+    )
 
 print(transcription.text)
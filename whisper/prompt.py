@@ -1,4 +1,15 @@
-prompt = """
+# Essentials only, for speech-to-text APIs whose prompt is advisory and
+# token-limited (e.g. OpenAI transcription); longer prompts are truncated.
+prompt_short = """
+Transcribe the audio exactly as spoken, in the native script of each spoken language.
+- Never romanize or translate: Hindi in Devanagari, Gujarati in Gujarati script, Tamil in Tamil script.
+- Keep English words in Latin script when spoken in English, e.g. "मैं Google में काम करता हूँ".
+- Preserve hesitations, stutters, repetitions and fillers; do not correct grammar.
+- Mark inaudible words as [unclear].
+- Label speakers ("Speaker 1:", "Speaker 2:") and return valid JSON.
+"""
+
+prompt_full = """
 # AUDIO TRANSCRIPTION SYSTEM PROMPT
 
 ## 1. PURPOSE
@@ -283,3 +294,6 @@ You will receive an audio file. Apply all rules above and return the transcripti
 
 Begin transcription.
 """
+
+# Kept for callers that take the full instructions (e.g. Gemini).
+prompt = prompt_full